@@ -1,10 +1,14 @@
 """Implements the blocking for these systems: Linux, darwin, Windows"""
 
+import os
 import platform
+import re
+import shutil
 import subprocess
-import time
+import tempfile
 
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 
 from typing import Literal, cast, TypedDict
 
@@ -20,12 +24,18 @@ SUBPROCESS_PRINT_BLOCKER: SUBPROCESS_PRINT_BLOCKER_TYPE = {
     "stderr": subprocess.DEVNULL,
 }
 
+# System this program is run on, it doesn't change while running
+_SYSTEM = platform.system().lower()
+
+# How many apps can be passed to one taskkill call
+TASKKILL_MAX_APPS = 30
+
 
 class IBlocker(ABC):
     """Basic class that acts as interface for future blocker class."""
 
     @abstractmethod
-    def block_apps(self, apps_to_block: list[str]) -> None:
+    def block_apps(self, apps_to_block: Sequence[str]) -> None:
         """
         This funcion block all of the apps that
         are supposed to be block for current task
@@ -33,7 +43,7 @@ class IBlocker(ABC):
         raise NotImplementedError("Abstract class")
 
     @abstractmethod
-    def block_websites(self, websites_to_block: list[str]) -> None:
+    def block_websites(self, websites_to_block: Sequence[str]) -> None:
         """
         This function block all of the websites for
         current task that is on the schedule
@@ -41,7 +51,7 @@ class IBlocker(ABC):
         raise NotImplementedError("Abstract class")
 
     @abstractmethod
-    def unblock_website(self, websites_to_unblock: list[str]) -> None:
+    def unblock_website(self, websites_to_unblock: Sequence[str]) -> None:
         """
         After the task is done, then ublock all of the
         previously blocked websites
@@ -49,7 +59,38 @@ class IBlocker(ABC):
         raise NotImplementedError("Abstract class")
 
 
-class Windows_Blocker(IBlocker):
+class Hosts_Blocker(IBlocker):
+    """Shared logic for the blockers that block websites through the hosts file"""
+
+    hosts_path: str
+
+    def _rewrite_hosts(self, sites: Sequence[str]) -> None:
+        """
+        Remove every line of the hosts file that mentions any of the sites.
+        Lines are streamed into a temporary file that then replaces the
+        hosts file, so it is never left half written
+        """
+        if not sites:
+            return
+        pattern = re.compile("|".join(map(re.escape, sites)))
+        dst = tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(self.hosts_path), delete=False
+        )
+        try:
+            with dst, open(self.hosts_path, "r") as src:
+                for line in src:
+                    if not pattern.search(line):
+                        dst.write(line)
+            # Both files are closed here, Windows can't replace an open file.
+            # Temporary file is created only readable by its owner
+            shutil.copymode(self.hosts_path, dst.name)
+            os.replace(dst.name, self.hosts_path)
+        except Exception:
+            os.remove(dst.name)
+            raise
+
+
+class Windows_Blocker(Hosts_Blocker):
     """Implements blocking websites and apps on windows"""
 
     def __init__(self) -> None:
@@ -57,49 +98,51 @@ class Windows_Blocker(IBlocker):
         self.hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
         self.redirect_ip = "127.0.0.1"
 
-    def block_apps(self, apps_to_block: list[str]) -> None:
-        """Force quit specified apps on Windows."""
-        for app in apps_to_block:
-            try:
-                subprocess.run(
-                    f"taskkill /IM {app}* /F", shell=True, **SUBPROCESS_PRINT_BLOCKER
-                )
-            except FileNotFoundError as e:
-                raise SystemError("Can' use command on this system!") from e
-            except Exception:
-                continue  # No app to clsoe found
-
-    def block_websites(self, websites_to_block: list[str]) -> None:
+    def block_apps(self, apps_to_block: Sequence[str]) -> None:
+        """
+        Force quit specified apps on Windows.
+        All of the apps are killed by one taskkill call (chunked,
+        so the command line doesn't grow too long)
+        """
+        for i in range(0, len(apps_to_block), TASKKILL_MAX_APPS):
+            image_names = " ".join(
+                f'/IM "{app}*"' for app in apps_to_block[i : i + TASKKILL_MAX_APPS]
+            )
+            # Non-zero return code only means that no app to close was found
+            subprocess.run(
+                f"taskkill /F {image_names}",
+                shell=True,
+                check=False,
+                **SUBPROCESS_PRINT_BLOCKER,
+            )
+
+    def block_websites(self, websites_to_block: Sequence[str]) -> None:
         """Modify the Windows hosts file to block access to specific websites."""
         try:
             with open(self.hosts_path, "a") as hosts_file:
                 for site in websites_to_block:
                     print(site)
                     hosts_file.write(f"\n{self.redirect_ip} {site}")
-            # Flush DNS and reset the ipconfig for these changes to take place
-            subprocess.run("ipconfig /flushdns", **SUBPROCESS_PRINT_BLOCKER)
-            subprocess.run("ipconfig /release", **SUBPROCESS_PRINT_BLOCKER)
-            time.sleep(0.5)
-            subprocess.run("ipconfig /renew", **SUBPROCESS_PRINT_BLOCKER)
-            time.sleep(3)
+            # Flush DNS and reset the ipconfig for these changes to take place,
+            # all in one shell so the waiting happens there as well
+            subprocess.run(
+                'cmd /c "ipconfig /flushdns & ipconfig /release & timeout /t 1 >NUL'
+                ' & ipconfig /renew & timeout /t 3 >NUL"',
+                **SUBPROCESS_PRINT_BLOCKER,
+            )
         except Exception as e:
             print(f"Failed to modify hosts file: {e}")
 
-    def unblock_website(self, websites_to_unblock: list[str]) -> None:
+    def unblock_website(self, websites_to_unblock: Sequence[str]) -> None:
         try:
-            with open(self.hosts_path, "r") as file:
-                lines = file.readlines()
-            with open(self.hosts_path, "w") as file:
-                for line in lines:
-                    if not any(site in line for site in websites_to_unblock):
-                        file.write(line)
+            self._rewrite_hosts(websites_to_unblock)
             # Flush DNS
             subprocess.run("ipconfig /flushdns", **SUBPROCESS_PRINT_BLOCKER)
         except Exception as e:
             print(f"Failed to modify hosts file: {e}")
 
 
-class MAC_Blocker(IBlocker):
+class MAC_Blocker(Hosts_Blocker):
     """Implements blocking websites and apps on MAC"""
 
     def __init__(self) -> None:
@@ -107,53 +150,53 @@ class MAC_Blocker(IBlocker):
         self.hosts_path = "/etc/hosts"
         self.redirect_ip = "127.0.0.1"
 
-    def block_apps(self, apps_to_block: list[str]) -> None:
-        """Force quit the specified apps on macOS."""
-        for app in apps_to_block:
-            try:
-                subprocess.run(
-                    ["pkill", "-f", app], check=True, **SUBPROCESS_PRINT_BLOCKER
-                )
-            except FileNotFoundError:
-                raise SystemError("Can't use pkill on your system!")
-            except Exception:
-                continue  # No process of that name found
+    def block_apps(self, apps_to_block: Sequence[str]) -> None:
+        """
+        Force quit the specified apps on macOS.
+        All of the apps are matched by one pkill call
+        """
+        if not apps_to_block:
+            return
+        try:
+            # Non-zero return code only means that no process was found
+            subprocess.run(
+                ["pkill", "-f", f"({'|'.join(apps_to_block)})"],
+                check=False,
+                **SUBPROCESS_PRINT_BLOCKER,
+            )
+        except FileNotFoundError:
+            raise SystemError("Can't use pkill on your system!")
 
-    def block_websites(self, websites_to_block: list[str]) -> None:
+    def block_websites(self, websites_to_block: Sequence[str]) -> None:
         """
         Modify the /etc/hosts file to block access to specific websites.
         If website already exists there don't do anything
         """
         try:
             with open(self.hosts_path, "r+") as hosts_file:
-                content = hosts_file.read()
-                for site in websites_to_block:
-                    if site in content:
-                        continue
-                    hosts_file.write(f"\n{self.redirect_ip} {site}")
-            # Flush DNS
+                existing = set(hosts_file.read().split())
+                new_sites = [site for site in websites_to_block if site not in existing]
+                if new_sites:
+                    hosts_file.write(
+                        "".join(f"\n{self.redirect_ip} {site}" for site in new_sites)
+                    )
+            # Flush DNS and reset the network, all in one shell
             subprocess.run(
-                ["sudo", "dscacheutil", "-flushcache"], **SUBPROCESS_PRINT_BLOCKER
+                [
+                    "sh",
+                    "-c",
+                    "sudo dscacheutil -flushcache; sudo killall -HUP mDNSResponder;"
+                    " sudo ifconfig en0 down; sleep 0.5; sudo ifconfig en0 up; sleep 3",
+                ],
+                **SUBPROCESS_PRINT_BLOCKER,
             )
-            subprocess.run(
-                ["sudo", "killall", "-HUP", "mDNSResponder"], **SUBPROCESS_PRINT_BLOCKER
-            )
-            subprocess.run("sudo ifconfig en0 down", **SUBPROCESS_PRINT_BLOCKER)
-            time.sleep(0.5)
-            subprocess.run("sudo ifconfig en0 up", **SUBPROCESS_PRINT_BLOCKER)
-            time.sleep(3)
         except Exception as e:
             print(f"Failed to modify hosts file: {e}")
 
-    def unblock_website(self, websites_to_unblock: list[str]) -> None:
+    def unblock_website(self, websites_to_unblock: Sequence[str]) -> None:
         """Remove blocked websites from /etc/hosts."""
         try:
-            with open(self.hosts_path, "r") as file:
-                lines = file.readlines()
-            with open(self.hosts_path, "w") as file:
-                for line in lines:
-                    if not any(site in line for site in websites_to_unblock):
-                        file.write(line)
+            self._rewrite_hosts(websites_to_unblock)
             # Flush DNS
             subprocess.run(
                 ["sudo", "dscacheutil", "-flushcache"], **SUBPROCESS_PRINT_BLOCKER
@@ -181,31 +224,29 @@ class Blocker:
     }
 
     def __init__(self) -> None:
-        system = platform.system().lower()
+        system = _SYSTEM
         if system not in self.SYSTEM_MAPPING.keys():
-            raise SystemError(
-                f"This system({self._system_used}) is currently not supported"
-            )
+            raise SystemError(f"This system({system}) is currently not supported")
         self._system_used: Literal["windows", "linux", "darwin"] = cast(
             Literal["windows", "linux", "darwin"], system
         )
         self._specific_blocker: IBlocker = self.SYSTEM_MAPPING[self._system_used]()
 
-    def block_apps(self, apps_to_block: list[str]) -> None:
+    def block_apps(self, apps_to_block: Sequence[str]) -> None:
         """
         This funcion block all of the apps that
         are passed to be block for current task
         """
         self._specific_blocker.block_apps(apps_to_block)
 
-    def block_websites(self, websites_to_block: list[str]) -> None:
+    def block_websites(self, websites_to_block: Sequence[str]) -> None:
         """
         This function block all of the websites for
         current task that is on the schedule
         """
         self._specific_blocker.block_websites(websites_to_block)
 
-    def unblock_websites(self, websites_to_unblock: list[str]) -> None:
+    def unblock_websites(self, websites_to_unblock: Sequence[str]) -> None:
         """
         This function unblock all of the previously
         blocked websites after the task is done
@@ -1,10 +1,23 @@
+import html
+import re
 from datetime import datetime
 from typing import Optional, TypedDict
 
-from bs4 import BeautifulSoup
-
 from BlockingApps.utils import TZ_INFO
 
+# Used to clean up the description of the task, line breaks and block
+# tags separate words, the rest (e.g. <b>) can be in the middle of one
+_BREAK_TAG_RE = re.compile(
+    r"</?(?:br|p|div|li|ul|ol|tr|td|th|h[1-6])\b[^>]*>", re.IGNORECASE
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+_TRANS = str.maketrans({"\r": "", "\\": " "})
+
+# Used to extract the blocking info from the cleaned up description
+_BLOCK_RE = re.compile(r"##blocking(.*?)##blocking", re.S)
+_APPS_RE = re.compile(r"block_apps:\s*([^;]*);")
+_WEBSITES_RE = re.compile(r"block_websites:\s*([^;]*);")
+
 
 class Blocked_Info(TypedDict):
     block_apps: list[str]
@@ -14,6 +27,18 @@ class Blocked_Info(TypedDict):
 class Task:
     "Representation of task from the calendar"
 
+    __slots__ = (
+        "title",
+        "start_time",
+        "end_time",
+        "repetition",
+        "description",
+        "blocking_info",
+        "block_apps",
+        "block_websites",
+        "_blocks_anything",
+    )
+
     def __init__(
         self,
         title: str,
@@ -29,72 +54,47 @@ class Task:
         self.description: str = description
 
         self.blocking_info: Blocked_Info = self.extract_blocking_info(description)
+        self.block_apps: tuple[str, ...] = tuple(self.blocking_info["block_apps"])
+        self.block_websites: tuple[str, ...] = tuple(
+            self.blocking_info["block_websites"]
+        )
+        self._blocks_anything: bool = bool(self.block_apps) or bool(self.block_websites)
 
     def _clean_description(self, text: str) -> str:
         """
         Removes HTML tags from a string while keeping the content and clean up the whole string
         for easier data extraction
         """
-        return (
-            BeautifulSoup(text, "html.parser")
-            .get_text()
-            .replace("<br>", "\\n")
-            .replace("\r", "")
-            .replace("\\n", " ")
-            .replace("\\", " ")
-        )
+        if "<" in text:
+            text = html.unescape(_TAG_RE.sub("", _BREAK_TAG_RE.sub(" ", text)))
+        return text.replace("\\n", " ").translate(_TRANS)
+
+    def _split_blocking_list(self, match: Optional[re.Match[str]]) -> list[str]:
+        "Turn the captured, comma separated list into the list of names"
+        if match is None:
+            return []
+        return [
+            string.strip() for string in match.group(1).split(",") if string.strip()
+        ]
 
     def extract_blocking_info(self, desc: str) -> Blocked_Info:
         "Extract the info about, what app and websites shall be blocked"
-        try:
-            blocking_info = {"block_apps": [], "block_websites": []}
-            desc = self._clean_description(desc).lower()
-
-            # Get the text beetwen the BLOCKING blocks
-            begin_index = desc.find("##blocking")
-            end_index = desc.find("##blocking", begin_index + 1)
-            desc_important_part = (
-                desc[begin_index:end_index].replace("##blocking", "").strip()
-            )
-            if desc_important_part == "":
-                raise ValueError("No blocking section on this task")
-
-            # Get the apps to block
-            desc_block_apps = (
-                desc_important_part[
-                    desc_important_part.find("block_apps:") : desc_important_part.find(
-                        ";"
-                    )
-                ]
-                .replace("block_apps:", "")
-                .replace(";", "")
-                .strip()
-            )
-            blocking_info["block_apps"] = [
-                string.strip().lower() for string in desc_block_apps.split(",")
-            ]
-
-            # Get the websites to block
-            first_index = desc_important_part.find("block_websites:")
-            desc_block_websites = (
-                desc_important_part[
-                    first_index : desc_important_part.find(";", first_index)
-                ]
-                .replace("block_websites:", "")
-                .replace(";", "")
-                .strip()
-            )
-            blocking_info["block_websites"] = [
-                string.strip().lower() for string in desc_block_websites.split(",")
-            ]
-
-            typed_return: Blocked_Info = {
-                "block_apps": blocking_info.get("block_apps", []),
-                "block_websites": blocking_info.get("block_websites", []),
-            }
-            return typed_return
-        except:
+        desc = self._clean_description(desc).lower()
+
+        # Get the text beetwen the BLOCKING blocks
+        block_match = _BLOCK_RE.search(desc)
+        if block_match is None:
             return {"block_apps": [], "block_websites": []}  # No blocking here
+        desc_important_part = block_match.group(1)
+
+        return {
+            "block_apps": self._split_blocking_list(
+                _APPS_RE.search(desc_important_part)
+            ),
+            "block_websites": self._split_blocking_list(
+                _WEBSITES_RE.search(desc_important_part)
+            ),
+        }
 
     def __str__(self) -> str:
         return f"Task: {self.title} | Start: {self.start_time} | End: {self.end_time} | Description: {self.description} | Repetition_rule: {self.repetition} | Blocking_info: {self.blocking_info}"
@@ -104,14 +104,12 @@ class Task:
         This function checks, whether this task is
         supposed to be blocking anything. If yes then return True
         """
-        if (
-            self.blocking_info["block_apps"] != []
-            and self.blocking_info["block_websites"] != []
-        ):
-            return True
-        return False
+        return self._blocks_anything
 
     def is_active(self) -> bool:
         """Check if the task is currently active based on the current time."""
-        now: datetime = datetime.now().astimezone(TZ_INFO)
+        return self.is_active_at(datetime.now(TZ_INFO))
+
+    def is_active_at(self, now: datetime) -> bool:
+        """Check if the task is active at the passed time."""
         return self.start_time <= now <= self.end_time
@@ -5,10 +5,15 @@ Only added value is to consider the RRULE attribute and to repeat the
 task based on that rule.
 """
 
+import json
+import os
 import re
-from collections.abc import Iterable
+import tempfile
+from collections.abc import Callable, Iterable
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any, Optional, TypedDict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import attr
 import requests
@@ -23,6 +28,13 @@ from BlockingApps.utils import TZ_INFO
 #### region: Full copy code from isc module
 
 GRAMMAR = contentlineParser()
+_UNFOLD_RE = re.compile(r"\r?\n[ \t]")
+# Name and params part of the line without any quoted param values,
+# only those lines are split by hand, the rest goes through the GRAMMAR
+_PARAM_VALUE = r'[^\x00-\x08\x0a-\x1f\x7f";:,]*'
+_SIMPLE_HEAD_RE = re.compile(
+    rf"[A-Za-z0-9-]+(?:;[A-Za-z0-9-]+={_PARAM_VALUE}(?:,{_PARAM_VALUE})*)*"
+)
 
 
 class Task_Args(TypedDict):
@@ -57,6 +69,8 @@ class ContentLine:
         value:  The value of the property
     """
 
+    __slots__ = ("name", "params", "value")
+
     def __init__(self, name: str, params: dict[str, list[str]] = {}, value: str = ""):
         self.name = name.upper()
         self.params = params
@@ -98,6 +112,17 @@ class ContentLine:
         """Parse a single iCalendar-formatted line into a ContentLine"""
         if "\n" in line or "\r" in line:
             raise ValueError("ContentLine can only contain escaped newlines")
+
+        # Common case of NAME[;PARAM=VAL[,VAL]]*:VALUE is split by hand
+        head, colon, value = line.partition(":")
+        if colon and _SIMPLE_HEAD_RE.fullmatch(head):
+            name, *params_list = head.split(";")
+            params = {}
+            for param in params_list:
+                param_name, _, param_values = param.partition("=")
+                params[param_name] = param_values.split(",")
+            return cls(name, params, value)
+
         try:
             ast = GRAMMAR.parse(line)
         except tatsu.exceptions.FailedToken:
@@ -148,19 +173,25 @@ class Container(list):
 
     @classmethod
     def parse(cls, name, tokenized_lines):
-        items = []
+        # Nested containers are kept on the stack instead of recursing
+        root = cls(name)
+        stack = [root]
         for line in tokenized_lines:
             if line.name == "BEGIN":
-                items.append(Container.parse(line.value, tokenized_lines))
+                container = cls(line.value)
+                stack[-1].append(container)
+                stack.append(container)
             elif line.name == "END":
-                if line.value != name:
+                if line.value != stack[-1].name:
                     raise ParseError(
-                        "Expected END:{}, got END:{}".format(name, line.value)
+                        "Expected END:{}, got END:{}".format(stack[-1].name, line.value)
                     )
-                break
+                stack.pop()
+                if not stack:
+                    break
             else:
-                items.append(line)
-        return cls(name, *items)
+                stack[-1].append(line)
+        return root
 
     def clone(self):
         """Makes a copy of itself"""
@@ -174,6 +205,41 @@ class Container(list):
 
 #### region: Added logic for RRULE attribute
 
+# Where the last fetched calendar is kept between the runs
+CACHE_PATH = Path.home() / ".cache" / "wtb" / "ical.json"
+
+
+class Calendar_Cache(TypedDict):
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    task_args: list[dict[str, Any]]
+
+
+def _line_to_datetime(line: ContentLine) -> datetime:
+    """
+    Get the time from the line, keeping its TZID as a ZoneInfo,
+    so it can be saved by name and repetitions follow its DST changes
+    """
+    time = iso_to_arrow(line).datetime  # type: ignore
+    if "TZID" in line.params:
+        try:
+            return time.astimezone(ZoneInfo(line.params["TZID"][0]))
+        except (ZoneInfoNotFoundError, ValueError):
+            pass  # Not a known zone name, so the time keeps its own zone
+    return time
+
+
+def _datetime_to_json(time: datetime) -> dict[str, Optional[str]]:
+    return {"iso": time.isoformat(), "zone": getattr(time.tzinfo, "key", None)}
+
+
+def _datetime_from_json(data: dict[str, Optional[str]]) -> datetime:
+    time = datetime.fromisoformat(data["iso"])  # type: ignore
+    if data["zone"] is not None:
+        return time.astimezone(ZoneInfo(data["zone"]))
+    return time
+
 
 class Parser:
     """
@@ -181,6 +247,15 @@ class Parser:
     file into the list of tasks
     """
 
+    # Maps the name of the line onto the task argument, that is read from it
+    _HANDLERS: dict[str, Callable[[ContentLine], tuple[str, Any]]] = {
+        "SUMMARY": lambda line: ("title", unescape_string(line.value)),
+        "DTSTART": lambda line: ("start_time", _line_to_datetime(line)),
+        "DTEND": lambda line: ("end_time", _line_to_datetime(line)),
+        "RRULE": lambda line: ("repetition", line.value),
+        "DESCRIPTION": lambda line: ("description", line.value),
+    }
+
     @classmethod
     def filter_task_by_today(cls, tasks: list[Task]) -> list[Task]:
         "Get only those tasks that are for today"
@@ -250,25 +325,23 @@ class Parser:
             return self._parse(self._string_to_content_lines(txt))  # full-string
 
     def _string_to_content_lines(self, txt: str):
-        txt = re.sub("\r?\n[ \t]", "", txt)
-        ast = GRAMMAR.parse(txt, rule_name="full")
-        for line in ast:
-            line = line[0]
-            name = "".join(line["name"])
-            value = "".join(line["value"])
-            params = {}
-            for param_ast in line.get("params", []):
-                param_name = "".join(param_ast["name"])
-                param_values = ["".join(x["value"]) for x in param_ast["values"]]
-                params[param_name] = param_values
-            yield ContentLine(name, params, value)
-
-    def _calendar_string_to_containers(
-        self, string: str
-    ) -> list[list[Container | ContentLine]]:
-        if not isinstance(string, str):
-            raise TypeError("Expecting a string")
-        return self._string_to_container(string)
+        txt = _UNFOLD_RE.sub("", txt)
+        # Split only on "\n", splitlines() would also split on the unicode
+        # separators that can be a part of the value
+        for nr, line in enumerate(txt.split("\n")):
+            line = line.strip("\r")
+            if line:
+                yield ContentLine.parse(line, nr)
+
+    def _lines_to_calendar(self, lines: Iterable[str]) -> Container:
+        "Parse the lines only up to the end of the first top level container"
+        tokenized_lines = self._tokenize_line(
+            self._unfold_lines(lines, with_linenr=True)
+        )
+        for line in tokenized_lines:
+            if line.name == "BEGIN":
+                return Container.parse(line.value, tokenized_lines)
+        raise ParseError("No calendar was found in the response")
 
     def _container_to_task_args(self, container: Container) -> Task_Args:
         "Get the container and gather all of the argruments needed for task class"
@@ -276,16 +349,10 @@ class Parser:
         for line in container:
             if not isinstance(line, ContentLine):
                 continue
-            if line.name == "SUMMARY":
-                args["title"] = unescape_string(line.value)
-            elif line.name == "DTSTART":
-                args["start_time"] = iso_to_arrow(line).datetime  # type: ignore
-            elif line.name == "DTEND":
-                args["end_time"] = iso_to_arrow(line).datetime  # type: ignore
-            elif line.name == "RRULE":
-                args["repetition"] = line.value
-            elif line.name == "DESCRIPTION":
-                args["description"] = line.value
+            handler = self._HANDLERS.get(line.name)
+            if handler is not None:
+                key, value = handler(line)
+                args[key] = value
 
         # Create dict specific for args, so all errors happens here
         try:
@@ -302,26 +369,80 @@ class Parser:
                 "Attribute needed to create task from file didin't exist"
             ) from e
 
-    def _request_to_containers(self, url: str) -> list[Container | ContentLine]:
-        "Make a reuquest to google calendar and transform it into container"
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise ConnectionError("Connection to google Calendar was not succesfull")
-        containers = self._calendar_string_to_containers(response.text)[0]
-        return containers
-
-    def get_tasks(self, url_ics: str) -> list[Task]:
-        """Main logic of this parser, that lets requestes become the tasks"""
-
-        def _get_this_weeks_sunday() -> datetime:
-            return datetime.now(TZ_INFO) + timedelta(
-                days=(6 - datetime.today().weekday()) % 7 + 7
-            )
-
-        # Make a reuqest
-        containers: list[Container | ContentLine] = self._request_to_containers(url_ics)
-
-        # Get the args for task
+    def _task_args_to_json(self, task_args: Task_Args) -> dict[str, Any]:
+        return {
+            **task_args,
+            "start_time": _datetime_to_json(task_args["start_time"]),
+            "end_time": _datetime_to_json(task_args["end_time"]),
+        }
+
+    def _task_args_from_json(self, data: dict[str, Any]) -> Task_Args:
+        return {
+            "title": data["title"],
+            "description": data["description"],
+            "start_time": _datetime_from_json(data["start_time"]),
+            "end_time": _datetime_from_json(data["end_time"]),
+            "repetition": data["repetition"],
+        }
+
+    def _load_cache(self, url: str) -> Optional[tuple[Calendar_Cache, list[Task_Args]]]:
+        """
+        Get the previously fetched calendar with its task args, if it was
+        fetched from the same url. It is kept as plain data, because it is
+        read with admin privileges
+        """
+        try:
+            if CACHE_PATH.parent.is_symlink() or CACHE_PATH.is_symlink():
+                return None
+            fd = os.open(CACHE_PATH, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+            with open(fd, "r", encoding="utf-8") as file:
+                cache: Calendar_Cache = json.load(file)
+            if cache["url"] != url:
+                return None
+            return cache, [self._task_args_from_json(d) for d in cache["task_args"]]
+        except Exception:
+            return None  # No cache yet or it can't be read
+
+    def _give_to_home_owner(self, path: Path | int) -> None:
+        """
+        Files created as root in the user's home should still belong to the user.
+        Path is never followed if it is a symlink
+        """
+        if not hasattr(os, "geteuid") or os.geteuid() != 0:  # type: ignore
+            return
+        home_stat = Path.home().stat()
+        if isinstance(path, int):
+            os.fchown(path, home_stat.st_uid, home_stat.st_gid)  # type: ignore
+        else:
+            os.lchown(path, home_stat.st_uid, home_stat.st_gid)  # type: ignore
+
+    def _save_cache(self, cache: Calendar_Cache) -> None:
+        """
+        Save the fetched calendar, so it doesn't have to be parsed again.
+        It is written as root into the user's directory, so it is first
+        written into a new private file that then replaces the cache
+        """
+        try:
+            for directory in (CACHE_PATH.parent.parent, CACHE_PATH.parent):
+                if not directory.exists():
+                    directory.mkdir(mode=0o700)
+                    self._give_to_home_owner(directory)
+            if CACHE_PATH.parent.is_symlink() or CACHE_PATH.is_symlink():
+                return
+            # mkstemp opens the file with O_EXCL, O_NOFOLLOW and mode 0600
+            fd, temp_path = tempfile.mkstemp(dir=CACHE_PATH.parent, suffix=".json")
+        except Exception:
+            return  # Cache is only an optimization
+        try:
+            with open(fd, "w", encoding="utf-8") as file:
+                self._give_to_home_owner(file.fileno())
+                json.dump(cache, file)
+            os.replace(temp_path, CACHE_PATH)
+        except Exception:
+            os.remove(temp_path)
+
+    def _containers_to_task_args(self, containers: Container) -> list[Task_Args]:
+        "Get the args for every event of the calendar"
         task_args_list: list[Task_Args] = []
         for content in containers:
             if isinstance(content, ContentLine):
@@ -331,6 +452,74 @@ class Parser:
             if content.name != "VEVENT":
                 continue
             task_args_list.append(self._container_to_task_args(content))
+        return task_args_list
+
+    def _request_to_task_args(self, url: str) -> list[Task_Args]:
+        """
+        Make a reuquest to google calendar and get the args of its tasks.
+        If the calendar didn't change since the last request, then the
+        cached args are used instead of parsing the calendar again
+        """
+        cached = self._load_cache(url)
+        headers: dict[str, str] = {}
+        if cached is not None:
+            cache = cached[0]
+            if cache["etag"]:
+                headers["If-None-Match"] = cache["etag"]
+            if cache["last_modified"]:
+                headers["If-Modified-Since"] = cache["last_modified"]
+
+        with requests.get(url, headers=headers, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                return cached[1]
+            if response.status_code != 200:
+                raise ConnectionError(
+                    "Connection to google Calendar was not succesfull"
+                )
+
+            # Parse the lines as they arrive, instead of the whole text at once
+            response.encoding = response.encoding or "utf-8"
+            lines = response.iter_lines(decode_unicode=True, delimiter="\n")
+            task_args_list = self._containers_to_task_args(
+                self._lines_to_calendar(lines)
+            )
+
+        self._save_cache(
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "task_args": [self._task_args_to_json(a) for a in task_args_list],
+            }
+        )
+        return task_args_list
+
+    def get_tasks(self, url_ics: str) -> list[Task]:
+        """Main logic of this parser, that lets requestes become the tasks"""
+
+        # Repeating tasks are expanded up to the next week's sunday
+        now = datetime.now(TZ_INFO)
+        week_end = now + timedelta(days=(6 - now.weekday()) % 7 + 7)
+
+        # Make a reuqest and get the args for task
+        task_args_list: list[Task_Args] = self._request_to_task_args(url_ics)
+
+        def _expand_repetition(task_args: Task_Args) -> list[Task]:
+            # Repetition makes it harder, beacause the event has
+            # to be repeated until it reaches our week end's
+            start_time = task_args["start_time"]
+            rule = rrulestr(task_args["repetition"], dtstart=start_time)  # type: ignore
+            occurrences = rule.between(start_time, week_end, inc=True)
+            return [
+                Task(
+                    title=task_args["title"],
+                    description=task_args["description"],
+                    repetition=task_args["repetition"],
+                    start_time=occ,
+                    end_time=occ + (task_args.get("end_time", start_time) - start_time),
+                )
+                for occ in occurrences
+            ]
 
         # Now, based on the gathered arguments for tasks, create a list of task
         task_list: list[Task] = []
@@ -343,24 +532,6 @@ class Parser:
                     )
                 )
                 continue
-
-            # Repetition makes it harder, beacause the event has
-            # to be repeated until it reaches our week end's
-            start_time = task_args["start_time"]
-            rule = rrulestr(task_args["repetition"], dtstart=start_time)
-            occurrences = rule.between(start_time, _get_this_weeks_sunday(), inc=True)
-            task_list.extend(
-                [
-                    Task(
-                        title=task_args["title"],
-                        description=task_args["description"],
-                        repetition=task_args["repetition"],
-                        start_time=occ,
-                        end_time=occ
-                        + (task_args.get("end_time", start_time) - start_time),
-                    )
-                    for occ in occurrences
-                ]
-            )
+            task_list.extend(_expand_repetition(task_args))
 
         return task_list
@@ -1,3 +1,5 @@
+import bisect
+import itertools
 import time
 import threading
 import ctypes
@@ -7,15 +9,18 @@ import subprocess
 import platform
 import shlex
 
+from datetime import datetime
 from typing import Optional
 
 from BlockingApps.blocker import Blocker
 from BlockingApps.taskParser import Parser, Task
+from BlockingApps.utils import TZ_INFO
 
 from calendar_url import ICAL_URL
 
-RUNNING = True
+STOP = threading.Event()
 CHECK_EVERY = 5 # Number of seconds that program will be asleep when checking the websites/apps
+RECHECK_APPS_EVERY = 60 # Number of seconds after which blocked apps are killed again
 ICAL_URL = ICAL_URL.strip()
 
 
@@ -52,23 +57,33 @@ def _run_as_admin():
 
 def _check_input_in_background():
     " Special thread that will be check to stop the loop"
-    global RUNNING
     input("Press Enter to stop the program...\n")  # Wait for user input
-    RUNNING = False  # Set the flag to False to break the loop
-    print(f"Please wait {CHECK_EVERY} seconds for program to end")
+    STOP.set()  # Wakes up the main loop, so it ends right away
 
-def get_active_task(tasks: list[Task]) -> Optional[Task]:
-    """Return the currently active task, if any."""
-    for task in tasks:
-        if task.is_active() and task.does_block_anything():
-            return task
+def get_active_task(
+    tasks: list[Task], starts: list[datetime], max_ends: list[datetime], now: datetime
+) -> Optional[Task]:
+    """
+    Return the task active at the passed time, if any.
+    Tasks have to be sorted by their start time, starts has to hold
+    these start times in the same order and max_ends the latest end time
+    of all the tasks up to the given index.
+    Tasks can overlap (e.g. a meeting inside of the whole day focus block),
+    then the active task that started the latest is returned
+    """
+    i = bisect.bisect_right(starts, now) - 1
+    # Walk back only while some earlier task can still be active
+    while i >= 0 and max_ends[i] >= now:
+        if tasks[i].end_time >= now:
+            return tasks[i]
+        i -= 1
     return None
 
 def unblock_all_tasks(tasks: list[Task], blocker: Blocker) -> None:
     " Make sure that all task are unlocked before exiting "
     for task in tasks:
         blocker.unblock_websites(
-            task.blocking_info["block_websites"]
+            task.block_websites
         )
 
 def main() -> None:
@@ -81,30 +96,57 @@ def main() -> None:
     parser = Parser()
     blocker = Blocker()
     tasks = parser.filter_task_by_today(parser.get_tasks(ICAL_URL))
+    # Only blocking tasks matter, sorted so the active one can be bisected
+    tasks = sorted(
+        [task for task in tasks if task.does_block_anything()],
+        key=lambda task: task.start_time,
+    )
+    starts = [task.start_time for task in tasks]
+    max_ends = list(itertools.accumulate((task.end_time for task in tasks), max))
     threading.Thread(target=_check_input_in_background).start()
 
     current_task = None
+    last_app_recheck = 0.0
     try:
-        while RUNNING:
-            print("Running: ", RUNNING)
-            active_task = get_active_task(tasks)
+        while not STOP.is_set():
+            print("Running: ", not STOP.is_set())
+            now = datetime.now(TZ_INFO)  # The same time for every task in this tick
+            active_task = get_active_task(tasks, starts, max_ends, now)
 
             if active_task and active_task != current_task:
                 print(f"🔒 Blocking for task: {active_task.title}")
-                if active_task.blocking_info:
-                    blocker.block_apps(active_task.blocking_info["block_apps"])
-                    blocker.block_websites(active_task.blocking_info["block_websites"])
+                # Tasks can overlap, so only the websites that differ between
+                # the previous and the new task have to be changed
+                blocked_websites = current_task.block_websites if current_task else ()
+                websites_to_unblock = [
+                    site
+                    for site in blocked_websites
+                    if site not in active_task.block_websites
+                ]
+                websites_to_block = [
+                    site
+                    for site in active_task.block_websites
+                    if site not in blocked_websites
+                ]
+                if websites_to_unblock:
+                    blocker.unblock_websites(websites_to_unblock)
+                blocker.block_apps(active_task.block_apps)
+                if websites_to_block:
+                    blocker.block_websites(websites_to_block)
                 current_task = active_task
+                last_app_recheck = time.monotonic()
 
-            elif current_task and not current_task.is_active():
+            elif current_task and not current_task.is_active_at(now):
                 print(f"✅ Unblocking after task: {current_task.title}")
-                blocker.unblock_websites(current_task.blocking_info["block_websites"])
+                blocker.unblock_websites(current_task.block_websites)
                 current_task = None
 
-            elif current_task:
-                blocker.block_apps(current_task.blocking_info["block_apps"])
+            elif current_task and time.monotonic() - last_app_recheck > RECHECK_APPS_EVERY:
+                # Kill the apps that were launched again in the meantime
+                blocker.block_apps(current_task.block_apps)
+                last_app_recheck = time.monotonic()
             
-            time.sleep(CHECK_EVERY)  # Check every 30 seconds
+            STOP.wait(CHECK_EVERY)  # Check every CHECK_EVERY seconds or until stopped
 
         # After ending the program's work make sure that all of the blockage was for sure ended!
         unblock_all_tasks(tasks, blocker)